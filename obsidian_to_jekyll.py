@@ -6,8 +6,9 @@
 # python obsidian_to_jekyll.py --print
 
 import argparse
+import functools
+import hashlib
 import os
-import pathlib
 import sys
 import time
 import re
@@ -18,27 +19,102 @@ from markdown_it import MarkdownIt  # pip install markdown-it-py[linkify,plugins
 from markdown_it.tree import SyntaxTreeNode
 import mdit_py_plugins.front_matter as md_frontmatter
 import yaml                         # pip install PyYAML
+try:
+    # libyaml bindings
+    from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
+except ImportError:
+    from yaml import SafeLoader, SafeDumper
 from datetime import datetime
 import regex                        # pip install regex
 
 post_subdir = "_posts" # Jekyll posts directory
 
+# precompiled patterns
+# every line boundary of str.splitlines()
+_NON_LF_BREAKS = r"\r\x0b\x0c\x1c-\x1e\x85\u2028\u2029"
+_LINE_BREAKS = r"\n" + _NON_LF_BREAKS
+_LINE_BREAK_RE = re.compile(f"[{_LINE_BREAKS}]")
+_NON_LF_BREAK_RE = re.compile(f"[{_NON_LF_BREAKS}]")
+# negated classes keep image and url scans linear, an image path may still
+# contain balanced parentheses
+_IMG_RE = re.compile(rf"!\[([^\]{_LINE_BREAKS}]*)\]"
+                     rf"\(((?:[^(){_LINE_BREAKS}]|\([^(){_LINE_BREAKS}]*\))+)\)")
+_SIZE_RE = re.compile(r"(\d+)(?:x(\d+))?")
+_CALLOUT_RE = re.compile(r"> \[!(warning|tip|danger|info)\]")
+# callout line and the quote lines following it
+_CALLOUT_BLOCK_RE = re.compile(r"^[^\S\n]*> \[!(?:warning|tip|danger|info)\][^\S\n]*$"
+                               r"(?:\n[^\S\n]*>.*)*", flags=re.M | re.I)
+# obsidian link: title, #head and |alias
+_WL_PAT = r"\[\[(.*?)(\#.*?)?(\|.*?)?\]\]"
+_WL_RE = re.compile(_WL_PAT)
+# obsidian links are matched first. url text (include image alt) may contain
+# whole obsidian links, but never ends inside one
+_LINK_RE = re.compile(_WL_PAT +
+                      r"|\[(?P<text>(?:\[\[[^\]\n]*\]\]|[^\]\n])*)\]\((?P<url>[^)\n]*)\)")
+# html codes of url text
+_URL_TITLE_TABLE = str.maketrans({'|': '&#124;'})
+_EMBED_RE = regex.compile(r"\!\[\[([^#|\n]+?)(#(.*?))?(\|(.*?))?\]\]")
+_FRONTMATTER_RE = re.compile(r'---\n.*?\n---\n', flags=re.DOTALL)
+_FM_BOUNDARY_RE = re.compile(r'-{3,}')
+_SLUG_RE = regex.compile(r'[^\p{M}\p{L}\p{Nd}]+', flags=regex.UNICODE)
+
 def eprint(*args, **kwargs):
     """error print"""
     print('\033[93m', file=sys.stderr, end='')
     print(*args, file=sys.stderr, **kwargs, end='')
     print('\033[0m', file=sys.stderr)
 
+@functools.lru_cache(maxsize=None)
+def compile_code(source):
+    """compile python code in Posts.md, identical code is compiled once"""
+    return compile(source, "<Posts.md python block>", "exec")
+
+@functools.lru_cache(maxsize=1)
+def markdown_parser():
+    """markdown-it-py parser of Posts.md and embedded notes, built once"""
+    return (
+        MarkdownIt("commonmark")
+            .use(md_frontmatter.front_matter_plugin)
+            .enable(["table","list"])
+    )
+
+@functools.lru_cache(maxsize=1)
+def vault_index(vault_path):
+    """walk vault once, index md files by name and by relative path, also
+       casefolded since obsidian resolves links regardless of case
+    """
+    names = {}
+    rel_paths = {}
+    folded_names = {}
+    folded_rel_paths = {}
+    root = os.path.abspath(vault_path)
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                # DirEntry caches file type, no extra stat
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.casefold().endswith(".md"):
+                    name = entry.name[:-3]
+                    rel_path = entry.path[len(root)+1:-3].replace(os.sep, '/')
+                    if entry.name.endswith(".md"):
+                        names.setdefault(name, []).append(entry.path)
+                        rel_paths.setdefault(rel_path, []).append(entry.path)
+                    folded_names.setdefault(name.casefold(), []).append(entry.path)
+                    folded_rel_paths.setdefault(rel_path.casefold(), []).append(entry.path)
+    return names, rel_paths, folded_names, folded_rel_paths
+
 def find_file(vault_path,name):
     """find md file of wikilink"""
+    names, rel_paths, folded_names, folded_rel_paths = vault_index(vault_path)
+    # exact match first
     if '/' in name:
-        glob_path = name + ".md"
+        paths = rel_paths.get(name) or folded_rel_paths.get(name.casefold(), [])
     else:
-        glob_path = "**/" + name + ".md"
-    paths = sorted(pathlib.Path(vault_path).glob(glob_path),
-                    key=lambda p: len(str(p)))
+        paths = names.get(name) or folded_names.get(name.casefold(), [])
     if len(paths) >= 1:
-        return paths[0].absolute()
+        return min(paths, key=len)
     else:
         eprint(f"POST {name} NOT FOUND!!!")
         exit(-1)
@@ -46,9 +122,10 @@ def find_file(vault_path,name):
 class Note:
     """Obsidian Note Class"""
 
-    def __init__(self, nodes, vault_path):
+    def __init__(self, tokens, vault_path):
         """
-        :param nodes are corresponding markdown-it-py nodes in Posts.md
+        :param tokens are corresponding top level markdown-it-py tokens in
+               Posts.md, the heading is given by its inline token
         :param vault_path is Obsidian vault path
         """
         self.name = ''
@@ -56,9 +133,10 @@ class Note:
         self.code = None
         self.post_code = None
         self.frontmatter = None
+        self.source_sha = ''
         self.vault_path = vault_path
 
-        self.parse(nodes)
+        self.parse(tokens)
         if self.file == '':
             eprint("CANNOT GET FILE NAME!!!")
             exit(-1)
@@ -66,29 +144,31 @@ class Note:
         self.read_content()
         self.set_frontmatter()
         self.exec_code()
+        self.source_sha = self.hash_source()
 
     def __str__(self):
         return f"Note(name={self.name},file={self.file},frontmatter={self.frontmatter},code={self.code})"
 
-    def parse(self, nodes):
-        """parse markdown-it-py nodes"""
-        for node in nodes:
-            if node.type == "heading":
-                self.name = node.children[0].content[2:-2]
+    def parse(self, tokens):
+        """parse markdown-it-py tokens"""
+        for token in tokens:
+            if token.type == "inline":
+                self.name = token.content[2:-2]
                 self.file = find_file(self.vault_path,self.name)
-            elif node.type == "fence" and node.info.lower() == "yaml":
-                self.frontmatter = yaml.load(node.content, yaml.Loader)
-            elif node.type == "fence" and node.info.lower() == "python":
+            elif token.type == "fence" and token.info.lower() == "yaml":
+                self.frontmatter = yaml.load(token.content, SafeLoader)
+            elif token.type == "fence" and token.info.lower() == "python":
                 # the python code normally is executed before content
                 # process (in Post class). if the first line of code
                 # is `# post`, then the code will be executed after
                 # content process.
-                if not self.code and not node.content.startswith("# post"):
-                    self.code = node.content
+                if not self.code and not token.content.startswith("# post"):
+                    self.code = token.content
                 else:
-                    self.post_code = node.content
+                    self.post_code = token.content
             else:
-                eprint(f"UNKNOWN NODE TYPE {node.type} in {self.name}!!!")
+                node_type = token.type.removesuffix("_open")
+                eprint(f"UNKNOWN NODE TYPE {node_type} in {self.name}!!!")
                 exit(-1)
 
     def read_content(self):
@@ -108,8 +188,9 @@ class Note:
             return time.strftime("%Y-%m-%d %H:%M:%S +0800", t)
         def same_day(a, b):
             return a.tm_year == b.tm_year and a.tm_yday == b.tm_yday
-        ctime = time.localtime(os.path.getctime(self.file))
-        mtime = time.localtime(os.path.getmtime(self.file))
+        st = os.stat(self.file)
+        ctime = time.localtime(st.st_ctime)
+        mtime = time.localtime(st.st_mtime)
         if 'date' not in self.frontmatter:
             self.frontmatter['date'] = format_time(ctime)
         elif type(self.frontmatter['date']) == datetime:
@@ -124,63 +205,94 @@ class Note:
             return
         ldict = {}
         content = self.content
-        exec(self.code, {'content': content}, ldict)
+        exec(compile_code(self.code), {'content': content}, ldict)
         self.content = ldict['content']
 
+    def hash_source(self) -> str:
+        """hash of frontmatter, content and post code, embedded notes are
+           not included
+        """
+        metadata = yaml.dump(self.frontmatter, Dumper=SafeDumper,
+                             allow_unicode=True)
+        source = '\0'.join([metadata, self.content, self.post_code or ''])
+        return hashlib.blake2b(source.encode('utf-8')).hexdigest()[:16]
+
     def render(self) -> str:
-        metadata = yaml.dump(self.frontmatter,encoding='utf-8',
-                             allow_unicode=True).decode()
+        metadata = yaml.dump(self.frontmatter, Dumper=SafeDumper,
+                             allow_unicode=True)
         return f"---\n{metadata}---\n\n{self.content}"
 
 class Post:
     """Jekyll Post Class"""
 
-    def __init__(self, blog_path: str,vault_path, /, note=None, file=None):
+    def __init__(self, blog_path: str,vault_path, /, note):
         """
         :param blog_path    path of local jekyll repository
         :param note         obsidian note object, used to construct post
                             from obsidian
-        :param file         existing jekyll post file path, used to construct
-                            post from old jekyll post
         """
-        if note and file:
-            eprint("Post.__init__ CAN ONLY HAVE NOTE OR FILE!!!")
-        if not note and not file:
-            eprint("Post.__init__ DON'T HAVE NOTE OR FILE!!!")
-
         self.blog_path = blog_path
         self.vault_path = vault_path
-        if note:
-            self.frontmatter = note.frontmatter
-            self.content = note.content
-            self.code = note.post_code
-            date_part = note.frontmatter['date'][:10]
-            name_part = '-'.join(note.name.lower().split(' '))
-            self.file = f"{date_part}-{name_part}.md"
-        else:
-            self.code = None
-            self.file = file
-            path = f"{blog_path}/{post_subdir}/{file}"
-            with open(path, 'r', encoding='utf-8') as f:
-                self.frontmatter, self.content = frontmatter.parse(f.read())
+        # source hash tells whether the written post is up to date
+        self.frontmatter = {**note.frontmatter,
+                            'source_sha': note.source_sha}
+        self.content = note.content
+        self.code = note.post_code
+        self.file = Post.file_name(note)
         self.full_path = f"{self.blog_path}/{post_subdir}/{self.file}"
 
+        self.normalize_line_breaks()
         self.process_image()
         self.process_callouts()
         self.process_embed_note()
-        self.process_obsidian_links()
-        self.process_urls()
+        self.process_links()
         self.exec_code()
 
+    @staticmethod
+    def file_name(note) -> str:
+        """jekyll post file name of obsidian note"""
+        date_part = note.frontmatter['date'][:10]
+        name_part = '-'.join(note.name.lower().split(' '))
+        return f"{date_part}-{name_part}.md"
+
+    @staticmethod
+    def load_frontmatter_only(blog_path: str, file) -> dict:
+        """read frontmatter of existing jekyll post, without its content"""
+        lines = []
+        with open(f"{blog_path}/{post_subdir}/{file}", 'r', encoding='utf-8') as f:
+            line = f.readline()
+            while line and not line.strip():
+                line = f.readline()
+            if not _FM_BOUNDARY_RE.fullmatch(line.rstrip()):
+                return {}
+            for line in f:
+                if _FM_BOUNDARY_RE.fullmatch(line.rstrip()):
+                    break
+                lines.append(line)
+            else:
+                # frontmatter is not closed
+                return {}
+        metadata = yaml.load(''.join(lines), SafeLoader)
+        return metadata if isinstance(metadata, dict) else {}
+
     def __str__(self):
         return f"Post(file={self.file},frontmatter={self.frontmatter})"
 
-    def set_image_size(self):
-        """syntax: ![alt text|100](xxx.png) or ![alt text|100x100](xxx.png)"""
+    def normalize_line_breaks(self):
+        """use \\n only, python code in Posts.md may leave other line breaks"""
+        if _NON_LF_BREAK_RE.search(self.content):
+            self.content = '\n'.join(self.content.splitlines())
+
+    def process_image(self):
+        """syntax: ![alt text|100](xxx.png), ![alt text|100x100](xxx.png)
+           or ![alt text|caption](xxx.png)
+        """
+        if '![' not in self.content:
+            return
         def get_image_size(alt):
             idx = alt.rfind('|')
             if idx != -1:
-                m = re.fullmatch(r"(\d+)(?:x(\d+))?", alt[idx+1:])
+                m = _SIZE_RE.fullmatch(alt[idx+1:])
                 if not m:
                     # is caption
                     return alt, 0, 0
@@ -189,36 +301,6 @@ class Post:
                 return alt[:idx], width, height
             else:
                 return alt, 0, 0
-
-        lines = self.content.splitlines()
-        for i in range(len(lines)):
-            imgs = re.finditer(r"!\[(.*)\]\((.+)\)", lines[i])
-            pos = 0
-            newline = ""
-            for img in imgs:
-                img_alt, img_width, img_height = get_image_size(img.group(1))
-                markups = []
-                if img_width:
-                    markups.append(f'width="{img_width}"')
-                if img_height:
-                    markups.append(f'height="{img_height}"')
-                if img.start() != 0 or img.end() != len(lines[i]):
-                    # inline image
-                    markups.append(".normal")
-                img_markup = f'![{img_alt}]({img.group(2)})'
-                if markups:
-                    img_markup += "{: " + ' '.join(markups) + " }"
-                newline += lines[i][pos:img.start()]
-                newline += img_markup
-                pos = img.end()
-            newline += lines[i][pos:]
-            lines[i] = newline
-        self.content = '\n'.join(lines)
-
-    def set_image_caption(self):
-        """syntax: ![alt text|caption](xxx.png)
-           called after set_image_size()
-        """
         def get_caption(alt):
             idx = alt.rfind('|')
             cap = ''
@@ -227,89 +309,60 @@ class Post:
                 alt = alt[:idx]
             return alt, cap
 
-        capline = []
-        newlines = []
-        for line in self.content.splitlines():
-            imgs = re.finditer(r"!\[(.*)\]\((.+)\)(?:{[^}]*})?", line)
-            newline = ""
-            pos = 0
-            caption = ""
-            for img in imgs:
-                img_alt, caption = get_caption(img.group(1))
-                if caption:
-                    if img.start() != 0 or img.end() != len(line):
-                        # inline image cannot have caption
-                        caption = ''
-                    # remove caption from alt text
-                    newline += line[pos:img.start(1)] + img_alt
-                    pos = img.end(1)
-            newlines.append(newline + line[pos:])
+        def process_img(img):
+            # size is parsed before caption
+            img_alt, img_width, img_height = get_image_size(img.group(1))
+            img_alt, caption = get_caption(img_alt)
+            markups = []
+            if img_width:
+                markups.append(f'width="{img_width}"')
+            if img_height:
+                markups.append(f'height="{img_height}"')
+            if (img.start() != 0 and
+                    not _LINE_BREAK_RE.match(img.string, img.start()-1)) or \
+               (img.end() != len(img.string) and
+                    not _LINE_BREAK_RE.match(img.string, img.end())):
+                # inline image cannot have caption
+                markups.append(".normal")
+                caption = ''
+            img_markup = f'![{img_alt}]({img.group(2)})'
+            if markups:
+                img_markup += "{: " + ' '.join(markups) + " }"
             if caption:
-                newlines.append(f"_{caption}_")
-        self.content = '\n'.join(newlines)
+                img_markup += f"\n_{caption}_"
+            return img_markup
 
-    def process_image(self):
-        # set size first
-        self.set_image_size()
-        self.set_image_caption()
+        self.content = _IMG_RE.sub(process_img, self.content)
 
     def process_callouts(self):
         """obsidian callouts to chirpy prompts"""
-        cur_type = ''
-        newlines = []
-        for line in self.content.splitlines():
-            if cur_type and not line.strip().startswith('>'):
-                newlines.append(f"{{: .prompt-{cur_type} }}")
-                cur_type = ''
-                newlines.append(line)
-                continue
-            m = re.fullmatch(r"> \[!(warning|tip|danger|info)\]",
-                             line.strip().lower())
-            if m:
-                cur_type = m.group(1)
-            else:
-                newlines.append(line)
-        if cur_type:
-            newlines.append(f"{{: .prompt-{cur_type} }}")
-        self.content = '\n'.join(newlines)
-
-    def process_urls(self):
-        """replace | in url text to html code &#124; because jekyll's bug"""
-        def process_title(title):
-            return title.replace('|', '&#124;')
-        def process_zotero_url(url):
-            if url.startswith('zotero://'):
-                eprint("ZOTERO LINK IN ", self.file, url, "!!!")
-        lines = self.content.splitlines()
-        new_lines = []
-        for i in range(len(lines)):
-            # include image alt
-            urls = re.finditer(r"\[(.*?)\]\((.*?)\)", lines[i])
-            newline = ""
-            pos = 0
-            for url in urls:
-                newline += lines[i][pos:url.start(1)] + process_title(url.group(1))
-                process_zotero_url(url.group(2))
-                pos = url.end(1)
-            lines[i] = newline + lines[i][pos:]
-        self.content = '\n'.join(lines)
+        if '[!' not in self.content:
+            return
+        def process_callout(block):
+            cur_type = ''
+            lines = []
+            for line in block.group().split('\n'):
+                m = _CALLOUT_RE.fullmatch(line.strip().lower())
+                if m:
+                    cur_type = m.group(1)
+                else:
+                    lines.append(line)
+            lines.append(f"{{: .prompt-{cur_type} }}")
+            return '\n'.join(lines)
+        self.content = _CALLOUT_BLOCK_RE.sub(process_callout, self.content)
 
     def process_embed_note(self):
+        if '![[' not in self.content:
+            return
         def extract_embed_section(embed_file: str, target: str) -> str:
             file = find_file(self.vault_path,embed_file)
-            f = open(file, encoding='utf-8')
-            md_content = f.read()
-            # 初始化解析器并启用行号跟踪
-            md = (
-                MarkdownIt("commonmark")
-                    .use(md_frontmatter.front_matter_plugin)
-                    .enable(["table","list"])
-            )
-            tokens = md.parse(md_content)
+            with open(file, encoding='utf-8') as f:
+                md_content = f.read()
+            tokens = markdown_parser().parse(md_content)
             root = SyntaxTreeNode(tokens)
             
             if target is None:
-                return re.sub(r'---\n.*?\n---\n','',md_content,flags=re.DOTALL)
+                return _FRONTMATTER_RE.sub('',md_content)
             elif target.startswith('^'):
                 filtered = list(map(lambda r:r,filter(lambda node: node.type == "paragraph" and ''.join([child.content for child in node.children if child.type == 'text' or child.type == 'inline']).endswith(target), root.children)))
                 if len(filtered) == 1:
@@ -343,46 +396,47 @@ class Post:
                     return '\n'+ '\n'.join(lines[start_line:end_line]).strip()+'\n'
                 return ""
         def replace_embed_note(content: str) -> str:
-            pattern = regex.compile(r"\!\[\[([^#|]+?)(#(.*?))?(\|(.*?))?\]\]",flags=regex.MULTILINE)
-            if pattern.search(content):
-                lines = content.splitlines()
-                new_lines = []
-                for i in range(len(lines)):
-                    # include obsidian embed note
-                    urls = pattern.finditer(lines[i])
-                    newline = ""
-                    pos = 0
-                    for url in urls:
-                        newline += lines[i][pos:url.start()] + replace_embed_note(extract_embed_section(url.group(1),url.group(3)))
-                        pos = url.end()
-                    lines[i] = newline + lines[i][pos:]
-                return '\n'.join(lines)
-            else:
-                return content
-        self.content = replace_embed_note(self.content)
-
-    def process_obsidian_links(self):
-        """format url"""
+            # include obsidian embed note, embedded notes may embed others
+            new_content, count = _EMBED_RE.subn(lambda url: replace_embed_note(extract_embed_section(url.group(1),url.group(3))),
+                                                content)
+            if count and new_content.endswith('\n'):
+                # an embedded note loses one trailing newline
+                new_content = new_content[:-1]
+            return new_content
+        content = replace_embed_note(self.content)
+        if not self.content.endswith('\n'):
+            # an embed at the end of post leaves no trailing newline
+            content = content.rstrip('\n')
+        self.content = content
+
+    def process_links(self):
+        """replace [[**]] to Tag <a>, and replace | in url text to html code
+           &#124; because jekyll's bug
+        """
+        if '[' not in self.content:
+            return
         def sanitize_slug(string: str) -> str:
-            pattern = regex.compile(r'[^\p{M}\p{L}\p{Nd}]+', flags=regex.UNICODE)
-            slug = regex.sub(pattern, '-', string.strip())
-            slug = regex.sub(r'^-|-$', '', slug, flags=regex.IGNORECASE)
-            return slug
-        """replace [[**]] to Tag <a>"""
-        def process_title(title, head, alias):
+            # runs of other characters become a single '-'
+            return _SLUG_RE.sub('-', string.strip()).strip('-')
+        def process_obsidian_link(title, head, alias):
             return f"<a href=\"/posts/{sanitize_slug(title.lower())}/{head or ''}\">{(alias or title).replace('|','')}</a>"
-        lines = self.content.splitlines()
-        new_lines = []
-        for i in range(len(lines)):
-            # include obsidian links
-            urls = re.finditer(r"\[\[(.*?)(\#.*?)?(\|.*?)?\]\]", lines[i])
-            newline = ""
-            pos = 0
-            for url in urls:
-                newline += lines[i][pos:url.start()] + process_title(url.group(1),url.group(2),url.group(3))
-                pos = url.end()
-            lines[i] = newline + lines[i][pos:]
-        self.content = '\n'.join(lines)
+        def process_nested_links(text):
+            # obsidian links inside url text or url
+            return _WL_RE.sub(lambda m: process_obsidian_link(*m.groups()), text)
+        def process_title(title):
+            return process_nested_links(title).translate(_URL_TITLE_TABLE)
+        def process_zotero_url(url):
+            if url.startswith('zotero://'):
+                eprint("ZOTERO LINK IN ", self.file, url, "!!!")
+
+        def process_link(link):
+            if link.group('text') is None:
+                return process_obsidian_link(*link.group(1, 2, 3))
+            url = process_nested_links(link.group('url'))
+            process_zotero_url(url)
+            return f"[{process_title(link.group('text'))}]({url})"
+
+        self.content = _LINK_RE.sub(process_link, self.content)
 
     def exec_code(self):
         """execute python code in Posts.md"""
@@ -390,12 +444,12 @@ class Post:
             return
         ldict = {}
         content = self.content
-        exec(self.code, {'content': content}, ldict)
+        exec(compile_code(self.code), {'content': content}, ldict)
         self.content = ldict['content']
 
     def render(self) -> str:
-        metadata = yaml.dump(self.frontmatter,encoding='utf-8',
-                             allow_unicode=True).decode()
+        metadata = yaml.dump(self.frontmatter, Dumper=SafeDumper,
+                             allow_unicode=True)
         return f"---\n{metadata}---\n\n{self.content}"
 
     def dump(self):
@@ -428,45 +482,52 @@ parser.add_argument('--commit_msg',
                     action='store')
 args = parser.parse_args()
 
-f = open(post_file, encoding='utf-8')
-text = f.read()
+with open(post_file, encoding='utf-8') as f:
+    text = f.read()
 
-md = (
-    MarkdownIt("commonmark")
-        .use(md_frontmatter.front_matter_plugin)
-        .enable(["table","list"])
-)
-tokens = md.parse(text)
-root = SyntaxTreeNode(tokens)
+tokens = markdown_parser().parse(text)
 
-# parse posts.md
-nodes = []
+# parse posts.md, only top level tokens are used
+note_tokens = []
 notes = []
-for node in root.children:
-    if node.type == 'front_matter':
+for i, token in enumerate(tokens):
+    if token.level != 0 or token.nesting == -1 or token.type == 'front_matter':
         continue
-    if node.type == "heading":
-        if len(nodes) > 0:
-            notes.append(Note(nodes, vault_path))
-        nodes.clear()
-    nodes.append(node)
-if len(nodes) > 0:
-    notes.append(Note(nodes, vault_path))
+    if token.type == "heading_open":
+        if len(note_tokens) > 0:
+            notes.append(Note(note_tokens, vault_path))
+        note_tokens.clear()
+        # heading text is in the following inline token
+        token = tokens[i+1]
+    note_tokens.append(token)
+if len(note_tokens) > 0:
+    notes.append(Note(note_tokens, vault_path))
+# Posts.md is no longer needed
+del text, tokens, note_tokens
 
 # check post update/add and write post file
 modified_posts = []
 newly_added_posts = []
 for note in notes:
+    post_file_name = Post.file_name(note)
+    post_path = f"{blog_path}/{post_subdir}/{post_file_name}"
+    old_frontmatter = None
+    if not args.force and not args.print and os.path.isfile(post_path):
+        # only the frontmatter header of old post is read
+        old_frontmatter = Post.load_frontmatter_only(blog_path, post_file_name)
+        if old_frontmatter.get('source_sha') == note.source_sha:
+            continue
     new_post = Post(blog_path,vault_path, note=note)
     if args.print:
         print(f"---------- {new_post.file} BEGIN ----------")
         print(new_post.render())
         print(f"---------- {new_post.file} END ----------")
-    if pathlib.Path(new_post.full_path).is_file():
-        old_post = Post(blog_path,vault_path, file=new_post.file)
-        if old_post.frontmatter == new_post.frontmatter:
+    if os.path.isfile(new_post.full_path):
+        if old_frontmatter is None:
+            old_frontmatter = Post.load_frontmatter_only(blog_path, new_post.file)
+        if old_frontmatter == new_post.frontmatter:
             if not args.force:
-                # content assumes the same since last_modified_at is equal
+                # content assumes the same since source_sha is equal
                 continue
         else:
             modified_posts.append(new_post)
@@ -481,7 +542,11 @@ if args.commit:
     changed_posts = newly_added_posts + modified_posts
     if len(changed_posts) > 0 or args.commit_msg:
         repo = Repo(blog_path)
-        repo.git.add(all=True)
+        if args.commit_msg:
+            # commit other changes of blog repository too
+            repo.git.add(all=True)
+        elif args.write:
+            repo.index.add([f"{post_subdir}/{p.file}" for p in changed_posts])
         modified = ','.join([p.file[:-3] for p in modified_posts])
         added = ','.join([p.file[:-3] for p in newly_added_posts])
         commit_msg = ""